@@ -1,6 +1,18 @@
+import os
 import re
-from Bio import SeqIO
+import mmap
+import string
+import ahocorasick
+import numpy as np
 from collections import defaultdict
+from dataclasses import dataclass, field
+from scanner_kernels import HAVE_NUMBA, build_literal_dfa, scan_literals_and_bases
+from kmer_features import BASE_CODES
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
 
 # ========================================
 # COMPREHENSIVE RESISTANCE GENE DATABASE
@@ -100,45 +112,502 @@ RESISTANCE_GENE_SIGNATURES = {
     },
 }
 
-def scan_genome_for_resistance_genes(fasta_file):
-    """Scan bacterial genome for resistance genes"""
-    record = list(SeqIO.parse(fasta_file, "fasta"))[0]
-    sequence = str(record.seq).upper()
+# Sequence features scored by predict_resistance_evolution
+MOBILE_ELEMENT_SIGNATURES = ['INTEGRON', 'TRANSPOSON', 'PLASMID', 'IS[0-9]+']
+HGT_MARKERS = ['ATGATG', 'TAATAA']
+COMPILED_EVOLUTION_SIGNATURES = {
+    signature: re.compile(signature.encode('ascii')) for signature in MOBILE_ELEMENT_SIGNATURES + HGT_MARKERS
+}
+
+def _split_literal_prefix(signature, keep_repeated=False):
+    """Split a signature into the literal text every match starts with and the rest
+
+    A character quantified with + is always left in the rest, so merging
+    never separates it from its quantifier. keep_repeated still counts it
+    in the prefix, since X+ always starts with X.
+    """
+    if '|' in signature:
+        # Alternatives do not share a single prefix
+        return '', f'(?:{signature})'
+    prefix = []
+    starts = []
+    i = 0
+    while i < len(signature):
+        char = signature[i]
+        if char == '\\' and i + 1 < len(signature) and not signature[i + 1].isalnum():
+            prefix.append(signature[i + 1])
+            starts.append(i)
+            i += 2
+            continue
+        if char in '*?{+':
+            # The quantifier stays attached to the preceding character
+            if prefix:
+                repeated = prefix.pop()
+                i = starts.pop()
+                if char == '+' and keep_repeated:
+                    prefix.append(repeated)
+            break
+        if char in '[(.^$\\':
+            break
+        prefix.append(char)
+        starts.append(i)
+        i += 1
+    return ''.join(prefix), signature[i:]
+
+def _literal_prefix(signature):
+    """Return the fixed literal text every match of a signature starts with"""
+    return _split_literal_prefix(signature, keep_repeated=True)[0]
+
+def _merge_alternatives(parts):
+    """Join (literal, rest) alternatives, factoring out shared literal prefixes
+    
+    Only neighbouring alternatives are grouped, so the engine still tries
+    them in their original order.
+    """
+    alternatives = []
+    i = 0
+    while i < len(parts):
+        literal, rest = parts[i]
+        j = i + 1
+        while literal and j < len(parts) and parts[j][0][:1] == literal[:1]:
+            j += 1
+        group = parts[i:j]
+        if len(group) == 1:
+            alternatives.append(re.escape(literal) + rest)
+        else:
+            common = os.path.commonprefix([literal for literal, _ in group])
+            inner = _merge_alternatives([(literal[len(common):], rest) for literal, rest in group])
+            alternatives.append(f'{re.escape(common)}(?:{inner})')
+        i = j
+    return '|'.join(alternatives)
+
+def merge_signatures(signatures):
+    """Trie-merge signature regexes into a single alternation, e.g. BLA(?:TEM[0-9]+|SHV[0-9]*)
+
+    >>> merge_signatures(['AB+', 'ABC'])
+    'A(?:B+|BC)'
+    """
+    return _merge_alternatives([_split_literal_prefix(signature) for signature in signatures])
+
+# Class metadata flattened into parallel lists indexed by class id. Each class
+# has one merged, precompiled alternation, with shared prefixes such as BLA
+# factored out so the engine tests them once. Signatures are upper-case and
+# build_context upper-cases every genome, so no case folding is needed.
+CLASSES = list(RESISTANCE_GENE_SIGNATURES)
+N_CLASSES = len(CLASSES)
+CLASS_COMPILED_REGEX = [
+    re.compile(merge_signatures(RESISTANCE_GENE_SIGNATURES[resistance_class]['signatures']).encode('ascii'))
+    for resistance_class in CLASSES
+]
+CLASS_MECHANISMS = [RESISTANCE_GENE_SIGNATURES[resistance_class]['mechanism'] for resistance_class in CLASSES]
+
+def _is_plain_literal(signature):
+    """Whether a signature matches exactly its literal prefix and nothing else"""
+    return re.escape(_literal_prefix(signature)) == signature
+
+# Evolution signatures whose anchor hits need no regex confirmation
+PLAIN_EVOLUTION_SIGNATURES = frozenset(
+    signature for signature in COMPILED_EVOLUTION_SIGNATURES if _is_plain_literal(signature)
+)
+
+def _collect_literals():
+    """Map every literal the genome is searched for to the (owner, kind) pairs using it
+    
+    Owners are class ids for gene signatures, and the signature itself for
+    the evolution features.
+    """
+    words = []
+    for class_id, resistance_class in enumerate(CLASSES):
+        gene_info = RESISTANCE_GENE_SIGNATURES[resistance_class]
+        words += [(_literal_prefix(signature), class_id, 'signature') for signature in gene_info['signatures']]
+    words += [(_literal_prefix(signature), signature, 'evolution') for signature in COMPILED_EVOLUTION_SIGNATURES]
+    
+    literals = {}
+    for word, owner, kind in words:
+        if not word:
+            raise ValueError(f"No literal prefix to anchor a {owner} signature")
+        entries = literals.setdefault(word, [])
+        if (owner, kind) not in entries:
+            entries.append((owner, kind))
+    return list(literals), [tuple(entries) for entries in literals.values()]
+
+# Literal words and, at the same index, the (owner, kind) pairs each stands for
+LITERAL_WORDS, LITERAL_ENTRIES = _collect_literals()
+
+def _build_signature_automaton():
+    """Aho-Corasick automaton over signature and evolution feature prefixes"""
+    automaton = ahocorasick.Automaton()
+    for word_id, word in enumerate(LITERAL_WORDS):
+        automaton.add_word(word, word_id)
+    automaton.make_automaton()
+    return automaton
+
+def _build_hyperscan_database():
+    """Hyperscan block-mode database over the same literals, if available"""
+    if hyperscan is None:
+        return None
+    database = hyperscan.Database()
+    database.compile(
+        expressions=[re.escape(word).encode('ascii') for word in LITERAL_WORDS],
+        ids=list(range(len(LITERAL_WORDS))),
+        elements=len(LITERAL_WORDS),
+        flags=[hyperscan.HS_FLAG_SOM_LEFTMOST] * len(LITERAL_WORDS),
+    )
+    return database
+
+# A single pass of any of these finds every place a signature can start, for
+# all resistance classes and evolution features at once.
+SIGNATURE_AUTOMATON = _build_signature_automaton()
+HYPERSCAN_DATABASE = _build_hyperscan_database()
+LITERAL_DFA = build_literal_dfa(LITERAL_WORDS) if HAVE_NUMBA else None
+
+# Lookup table marking unambiguous nucleotides
+_ACGT = np.zeros(256, dtype=bool)
+_ACGT[list(b'ACGT')] = True
+
+def _common_prefix(seq_array, a, b, limit):
+    """Length of the common prefix of seq_array[a:] and seq_array[b:], capped at limit"""
+    limit = min(limit, seq_array.size - max(a, b))
+    matched = 0
+    window = 64
+    while matched < limit:
+        stop = min(matched + window, limit)
+        mismatch = np.flatnonzero(seq_array[a + matched:a + stop] != seq_array[b + matched:b + stop])
+        if mismatch.size:
+            return matched + int(mismatch[0])
+        matched = stop
+        window *= 2
+    return limit
+
+def _periodic_run_end(seq_array, start, unit):
+    """End of the stretch beginning at start that repeats with the given period"""
+    return start + unit + _common_prefix(seq_array, start, start + unit, seq_array.size)
+
+def _clean_runs(seq_array, min_length):
+    """Start and stop positions of the ACGT-only runs of at least min_length bases"""
+    valid = np.concatenate(([False], _ACGT[seq_array], [False]))
+    edges = np.flatnonzero(valid[1:] != valid[:-1])
+    run_starts, run_stops = edges[::2], edges[1::2]
+    long_enough = run_stops - run_starts >= min_length
+    return run_starts[long_enough], run_stops[long_enough]
+
+def _overlapping_runs(runs, start, stop):
+    """Index range of the runs that overlap start..stop-1"""
+    run_starts, run_stops = runs
+    return np.searchsorted(run_stops, start, 'right'), np.searchsorted(run_starts, stop, 'left')
+
+def _short_square_units(seq_array, start, stop, min_unit, max_unit, runs):
+    """Shortest ACGT unit of min_unit..max_unit bases repeated immediately at each of start..stop-1, else 0
+
+    Only the span covered by runs from _clean_runs(seq_array, 2 * min_unit)
+    can hold a square, so the rest of the window is skipped.
+    """
+    units = np.zeros(stop - start, dtype=np.int64)
+    run_starts, run_stops = runs
+    first, last = _overlapping_runs(runs, start, stop)
+    if first >= last:
+        return units
+    lo = max(start, int(run_starts[first]))
+    hi = min(stop, int(run_stops[last - 1]))
+    window = seq_array[lo:hi + 2 * max_unit]
+    valid = _ACGT[window]
+    span = units[lo - start:hi - start]
+    for unit in range(min_unit, max_unit + 1):
+        if window.size < 2 * unit:
+            break
+        good = valid[:window.size - unit] & (window[:-unit] == window[unit:])
+        bad_so_far = np.concatenate(([0], np.cumsum(~good, dtype=np.int32)))
+        is_square = (bad_so_far[unit:] - bad_so_far[:-unit]) == 0
+        is_square = is_square[:span.size]
+        unset = span[:is_square.size] == 0
+        span[:is_square.size][unset & is_square] = unit
+    return units
+
+def _seed_codes(seq_array, start, stop, seed):
+    """2-bit packed codes of the seed-base windows starting at start..stop-1, and which are all ACGT"""
+    digits = BASE_CODES[seq_array[start:stop + seed - 1]]
+    codes = np.zeros(stop - start, dtype=np.uint32)
+    ambiguous = np.zeros(stop - start, dtype=bool)
+    for j in range(seed):
+        window = digits[j:j + codes.size]
+        codes <<= 2
+        codes |= window & 3
+        ambiguous |= window > 3
+    return codes, ~ambiguous
+
+def _long_square_units(seq_array, start, stop, seed, chunk_size, runs):
+    """Shortest ACGT unit of seed or more bases repeated immediately at each of start..stop-1, else 0
+
+    A square with unit p at x repeats its first seed bases at x + p, so the
+    genome is swept for windows whose seed code is in a bitset of the codes
+    starting at start..stop-1, and only those pairs are compared in full.
+    Both copies lie in one clean run from _clean_runs(seq_array, 2 * seed),
+    so the sweep only spans the runs overlapping start..stop-1.
+    """
+    n = seq_array.size
+    units = np.zeros(stop - start, dtype=np.int64)
+    x_stop = min(stop, n - 2 * seed + 1)
+    run_starts, run_stops = runs
+    first, last = _overlapping_runs(runs, start, x_stop)
+    if x_stop <= start or first >= last:
+        return units
+    codes, clean = _seed_codes(seq_array, start, x_stop, seed)
+    order = np.argsort(codes[clean], kind='stable')
+    xs = (start + np.flatnonzero(clean))[order]
+    x_codes = codes[clean][order]
+    bitset = np.zeros(1 << max(2 * seed - 3, 0), dtype=np.uint8)
+    np.bitwise_or.at(bitset, x_codes >> 3, np.left_shift(1, x_codes & 7).astype(np.uint8))
+    
+    # x + 2p <= end of x's run bounds the second copy's start j = x + p
+    j_stop = min((int(run_stops[last - 1]) + x_stop - 1) // 2 + 1, n - seed + 1)
+    cand_x, cand_p = [], []
+    for j_start in range(max(start, int(run_starts[first])) + seed, j_stop, chunk_size):
+        j_codes, j_clean = _seed_codes(seq_array, j_start, min(j_start + chunk_size, j_stop), seed)
+        seen = (bitset[j_codes >> 3] >> (j_codes & 7)) & 1
+        hits = np.flatnonzero(j_clean & (seen == 1))
+        lo = np.searchsorted(x_codes, j_codes[hits], 'left')
+        n_each = np.searchsorted(x_codes, j_codes[hits], 'right') - lo
+        firsts = np.repeat(lo - np.cumsum(n_each) + n_each, n_each)
+        x = xs[firsts + np.arange(firsts.size)]
+        p = np.repeat(j_start + hits, n_each) - x
+        keep = (p >= seed) & (x + 2 * p <= n)
+        cand_x.append(x[keep])
+        cand_p.append(p[keep])
+    if not cand_x:
+        return units
+    cand_x = np.concatenate(cand_x)
+    cand_p = np.concatenate(cand_p)
+    # By position, then unit, so the first confirmed unit at x is the shortest
+    order = np.lexsort((cand_p, cand_x))
+    for x, p in zip(cand_x[order].tolist(), cand_p[order].tolist()):
+        if units[x - start]:
+            continue
+        if _common_prefix(seq_array, x, x + p, p) == p and _ACGT[seq_array[x:x + p]].all():
+            units[x - start] = p
+    return units
+
+def count_tandem_repeats(seq_array, min_unit=3, limit=None, short_unit=12, chunk_size=1 << 22):
+    """Count non-overlapping tandem repeats in a uint8 nucleotide array
+    
+    Scans left to right, taking the shortest ACGT unit of at least min_unit
+    bases that is immediately repeated, plus every whole copy that follows;
+    unit length is unbounded, as in the ([ATCG]{3,})\\1+ regex this replaces.
+    Units up to short_unit bases are found with one vectorised comparison
+    per length, longer ones from short_unit + 1 base seeds. Positions are
+    taken in windows that double up to chunk_size. Each window only looks
+    inside the clean ACGT runs it overlaps, so stretches of N are skipped,
+    but a long clean run with no repeat is swept for seeds by every window
+    it spans; real genomes reach limit within the first few windows.
+    """
+    n = seq_array.size
+    seed = max(short_unit + 1, min_unit)
+    short_runs = _clean_runs(seq_array, 2 * min_unit)
+    long_runs = _clean_runs(seq_array, 2 * seed)
+    count = 0
+    next_free = 0
+    window_start = 0
+    window = 1 << 12
+    while window_start < n:
+        window_stop = min(window_start + window, n)
+        units = _short_square_units(seq_array, window_start, window_stop, min_unit, short_unit, short_runs)
+        long_units = _long_square_units(seq_array, window_start, window_stop, seed, chunk_size, long_runs)
+        units = np.where(units > 0, units, long_units)
+        
+        for offset in np.flatnonzero(units):
+            start = window_start + int(offset)
+            if start < next_free:
+                continue
+            unit = int(units[offset])
+            run_length = _periodic_run_end(seq_array, start, unit) - start
+            next_free = start + run_length - run_length % unit
+            count += 1
+            if limit is not None and count >= limit:
+                return count
+        window_start = window_stop
+        window = min(window * 2, chunk_size)
+    return count
+
+@dataclass(eq=False)
+class GenomeContext:
+    """Everything the analyses share about one genome, computed in a single pass
+    
+    seq_bytes is the upper-cased genome and seq_array a uint8 view of it.
+    class_anchors holds, per class id, the positions where a signature's
+    literal prefix occurs.
+    tandem_repeats is capped at 11, enough for the mutation hotspot test.
+    """
+    seq_bytes: bytes
+    seq_array: np.ndarray
+    base_counts: np.ndarray
+    gc_content: float
+    class_anchors: list
+    evolution_anchors: dict
+    tandem_repeats: int
+
+# Upper-cases ASCII letters in a single bytes.translate pass
+UP_TABLE = bytes.maketrans(string.ascii_lowercase.encode('ascii'), string.ascii_uppercase.encode('ascii'))
+
+def build_context(sequence):
+    """Build the shared GenomeContext for a genome sequence (bytes or str, any case)"""
+    if isinstance(sequence, str):
+        sequence = sequence.encode('ascii')
+    seq_bytes = sequence.translate(UP_TABLE)
+    seq_array = np.frombuffer(seq_bytes, dtype=np.uint8)
+    class_anchors = [set() for _ in range(N_CLASSES)]
+    evolution_anchors = defaultdict(set)
+    
+    def record(word_id, start):
+        for owner, kind in LITERAL_ENTRIES[word_id]:
+            if kind == 'signature':
+                class_anchors[owner].add(start)
+            else:
+                evolution_anchors[owner].add(start)
+    
+    if LITERAL_DFA is not None:
+        hit_ids, hit_starts, base_counts = scan_literals_and_bases(seq_array, LITERAL_DFA)
+        for word_id, start in zip(hit_ids.tolist(), hit_starts.tolist()):
+            record(word_id, start)
+    else:
+        base_counts = np.bincount(seq_array, minlength=256)
+        if HYPERSCAN_DATABASE is not None:
+            def on_match(word_id, start, end, flags, context):
+                record(word_id, start)
+            HYPERSCAN_DATABASE.scan(seq_bytes, match_event_handler=on_match)
+        else:
+            for end, word_id in SIGNATURE_AUTOMATON.iter(seq_bytes.decode('ascii')):
+                record(word_id, end - len(LITERAL_WORDS[word_id]) + 1)
+    
+    gc_count = int(base_counts[ord('G')] + base_counts[ord('C')])
+    return GenomeContext(
+        seq_bytes=seq_bytes,
+        seq_array=seq_array,
+        base_counts=base_counts,
+        gc_content=gc_count / seq_array.size if seq_array.size else 0.0,
+        class_anchors=class_anchors,
+        evolution_anchors=evolution_anchors,
+        tandem_repeats=count_tandem_repeats(seq_array, limit=11),
+    )
+
+def _as_context(genome):
+    """Accept a GenomeContext or a genome sequence as str, bytes or a uint8 array"""
+    if isinstance(genome, GenomeContext):
+        return genome
+    if isinstance(genome, np.ndarray):
+        genome = genome.astype(np.uint8, copy=False).tobytes()
+    return build_context(genome)
+
+def compute_base_composition(genome):
+    """Per-base counts and GC fraction of a genome"""
+    context = _as_context(genome)
+    composition = {base: int(context.base_counts[ord(base)]) for base in 'ACGTN'}
+    composition['length'] = context.seq_array.size
+    composition['gc_content'] = context.gc_content
+    return composition
+
+def _first_record_span(buffer):
+    """(start, stop) of the first FASTA record's sequence lines, or None"""
+    header = 0 if buffer[:1] == b'>' else buffer.find(b'\n>') + 1
+    if header == 0 and buffer[:1] != b'>':
+        return None
+    start = buffer.find(b'\n', header)
+    if start == -1:
+        return len(buffer), len(buffer)
+    # The record ends at the next line that starts with '>'
+    stop = buffer.find(b'\n>', start)
+    return start + 1, len(buffer) if stop == -1 else max(stop, start + 1)
+
+def read_genome_sequence(fasta_file, chunk_size=1 << 24):
+    """Read the first genome in a FASTA file as raw bytes
+
+    The file is memory-mapped rather than read, and the record's line
+    breaks and other whitespace are dropped chunk_size bytes at a time.
+    """
+    span = None
+    if os.path.getsize(fasta_file):
+        with open(fasta_file, 'rb') as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            span = _first_record_span(buffer)
+    if span is None:
+        raise ValueError(f"No sequences found in {fasta_file}")
+    start, stop = span
+    if start == stop:
+        return b''
+    body = np.memmap(fasta_file, dtype=np.uint8, mode='r', offset=start, shape=(stop - start,))
+    sequence = np.empty(body.size, dtype=np.uint8)
+    size = 0
+    for chunk_start in range(0, body.size, chunk_size):
+        chunk = body[chunk_start:chunk_start + chunk_size]
+        kept = chunk[chunk > ord(' ')]
+        sequence[size:size + kept.size] = kept
+        size += kept.size
+    return sequence[:size].tobytes()
+
+def read_genome_context(fasta_file):
+    """Read the first genome in a FASTA file and build its GenomeContext"""
+    return build_context(read_genome_sequence(fasta_file))
+
+def scan_fasta_for_resistance_genes(fasta_file):
+    """Scan the first genome in a FASTA file for resistance genes"""
+    return scan_genome_for_resistance_genes(read_genome_context(fasta_file))
+
+@dataclass(slots=True)
+class ClassHits:
+    """Signature hits for one class, as parallel lists"""
+    positions: list = field(default_factory=list)
+    seqs: list = field(default_factory=list)
+    
+    def to_dicts(self):
+        """The per-gene dicts reported in scan results"""
+        return [
+            {'position': position, 'sequence': seq, 'confidence': 0.9}
+            for position, seq in zip(self.positions, self.seqs)
+        ]
+
+def scan_genome_for_resistance_genes(genome):
+    """Scan a bacterial genome (GenomeContext, sequence or uint8 array) for resistance genes"""
     detected_genes = defaultdict(list)
     
-    for resistance_class, gene_info in RESISTANCE_GENE_SIGNATURES.items():
+    context = _as_context(genome)
+    seq_bytes = context.seq_bytes
+    
+    for class_id in range(N_CLASSES):
         class_score = 0
-        found_genes = []
+        hits = ClassHits()
         
-        for signature in gene_info['signatures']:
-            matches = re.finditer(signature, sequence, re.IGNORECASE)
-            for match in matches:
-                found_genes.append({
-                    'position': match.start(),
-                    'sequence': match.group(),
-                    'confidence': 0.9
-                })
+        # Only confirm the full signature regex where its literal prefix was seen
+        compiled = CLASS_COMPILED_REGEX[class_id]
+        last_end = 0
+        for start in sorted(context.class_anchors[class_id]):
+            if class_score >= 1.0:
+                # The score is capped at 1.0, so further hits change nothing
+                break
+            if start < last_end:
+                continue
+            match = compiled.match(seq_bytes, start)
+            if match:
+                hits.positions.append(start)
+                hits.seqs.append(match.group().decode('ascii'))
                 class_score += 0.3
+                last_end = match.end()
         
-        for marker, prob in gene_info.get('probability_markers', []):
-            if marker in sequence:
-                class_score += prob
-                found_genes.append({
-                    'marker': marker,
-                    'confidence': prob
-                })
-        
-        if found_genes:
-            detected_genes[resistance_class] = {
-                'genes': found_genes,
+        if hits.positions:
+            detected_genes[CLASSES[class_id]] = {
+                'genes': hits.to_dicts(),
                 'score': min(class_score, 1.0),
-                'mechanism': gene_info['mechanism']
+                'mechanism': CLASS_MECHANISMS[class_id]
             }
     
     return detected_genes
 
-def predict_resistance_evolution(sequence, antibiotic_class):
-    """Predict likelihood of resistance evolution under antibiotic pressure"""
+def _evolution_signature_found(context, signature):
+    """Whether an evolution signature matches at any of its anchor positions"""
+    anchors = context.evolution_anchors.get(signature, ())
+    if signature in PLAIN_EVOLUTION_SIGNATURES:
+        return bool(anchors)
+    compiled = COMPILED_EVOLUTION_SIGNATURES[signature]
+    return any(compiled.match(context.seq_bytes, start) for start in anchors)
+
+def predict_resistance_evolution(genome, antibiotic_class):
+    """Predict likelihood of resistance evolution for a GenomeContext or sequence"""
     evolution_factors = {
         'high_gc_content': 0.0,
         'mobile_elements': 0.0,
@@ -146,20 +615,19 @@ def predict_resistance_evolution(sequence, antibiotic_class):
         'mutation_hotspots': 0.0,
     }
     
-    gc_content = (sequence.count('G') + sequence.count('C')) / len(sequence)
-    if gc_content > 0.55:
+    context = _as_context(genome)
+    
+    if context.gc_content > 0.55:
         evolution_factors['high_gc_content'] = 0.3
     
-    mobile_signatures = ['INTEGRON', 'TRANSPOSON', 'PLASMID', 'IS[0-9]+']
-    for sig in mobile_signatures:
-        if re.search(sig, sequence, re.IGNORECASE):
+    for sig in MOBILE_ELEMENT_SIGNATURES:
+        if _evolution_signature_found(context, sig):
             evolution_factors['mobile_elements'] += 0.2
     
-    if 'ATGATG' in sequence or 'TAATAA' in sequence:
+    if any(_evolution_signature_found(context, marker) for marker in HGT_MARKERS):
         evolution_factors['horizontal_gene_transfer'] = 0.15
     
-    repeat_count = len(re.findall(r'([ATCG]{3,})\1+', sequence))
-    if repeat_count > 10:
+    if context.tandem_repeats > 10:
         evolution_factors['mutation_hotspots'] = 0.25
     
     base_probability = 0.15
@@ -1,25 +1,117 @@
 import streamlit as st
-from Bio import SeqIO
+import io
+from Bio.SeqIO.FastaIO import SimpleFastaParser
 import pandas as pd
+import numpy as np
 import pickle
-from collections import Counter
 import os
-from advanced_gene_scanner import scan_genome_for_resistance_genes, predict_resistance_evolution
+from functools import lru_cache
+from joblib import Parallel, delayed
+from advanced_gene_scanner import build_context, compute_base_composition, scan_genome_for_resistance_genes, predict_resistance_evolution
+from kmer_features import top_kmer_counts
+from model_store import (
+    MODEL_DIR, N_TOP_KMERS, FEATURE_COLS, COL_TO_IDX,
+    LazyModelDict, to_float32, file_digest, load_onnx_session, onnx_matches, predict_onnx,
+)
 
 st.set_page_config(page_title="AMR Forecasting", page_icon="🧬", layout="wide")
 
 @st.cache_resource
 def load_models():
+    if os.path.isdir(MODEL_DIR):
+        return LazyModelDict(MODEL_DIR)
     if not os.path.exists('comprehensive_amr_models.pkl'):
         st.error("⚠️ Models not found! Please contact admin.")
         return None
     try:
         with open('comprehensive_amr_models.pkl', 'rb') as f:
-            return pickle.load(f)
+            models = pickle.load(f)
+        for model_data in models.values():
+            to_float32(model_data)
+        return models
     except Exception as e:
         st.error(f"Error loading models: {e}")
         return None
 
+@st.cache_resource
+def load_onnx_models(_models):
+    """The exported ONNX pack, unless it was built from different models than _models"""
+    session = load_onnx_session()
+    if session is None:
+        return None
+    if isinstance(_models, LazyModelDict):
+        source_digest = _models.source_digest
+    else:
+        source_digest = file_digest('comprehensive_amr_models.pkl')
+    if not onnx_matches(session, _models, source_digest):
+        st.warning("⚠️ amr_models.onnx is out of date with the loaded models; using them directly instead.")
+        return None
+    return session
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def load_genome(file_bytes):
+    """Parse an uploaded FASTA file into (record_id, record_count, GenomeContext)"""
+    record_id = None
+    record_seq = None
+    record_count = 0
+    for title, sequence in SimpleFastaParser(io.TextIOWrapper(io.BytesIO(file_bytes), encoding='utf-8')):
+        if record_count == 0:
+            record_id = title.split(None, 1)[0] if title else ''
+            record_seq = sequence.encode('ascii')
+        record_count += 1
+    if record_count == 0:
+        return None, 0, None
+    return record_id, record_count, build_context(record_seq)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def featurize(file_bytes):
+    """Genome summary and the model feature vector for an uploaded FASTA file"""
+    record_id, record_count, genome = load_genome(file_bytes)
+    if genome is None:
+        return {'record_id': None, 'record_count': 0}
+    composition = compute_base_composition(genome)
+    gc_percent = composition['gc_content'] * 100
+    n_percent = composition['N'] / composition['length'] * 100 if composition['length'] else 0.0
+    features = np.empty(len(FEATURE_COLS), dtype=np.float32)
+    features[:N_TOP_KMERS] = top_kmer_counts(genome.seq_array, k=8, n_top=N_TOP_KMERS, base_counts=genome.base_counts)
+    features[COL_TO_IDX['genome_length']] = composition['length']
+    features[COL_TO_IDX['gc_content']] = gc_percent
+    return {
+        'record_id': record_id,
+        'record_count': record_count,
+        'length': composition['length'],
+        'gc_percent': gc_percent,
+        'n_percent': n_percent,
+        'features': features,
+    }
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def scan_genes(file_bytes):
+    return dict(scan_genome_for_resistance_genes(load_genome(file_bytes)[2]))
+
+@lru_cache(maxsize=None)
+def feature_index(feature_cols):
+    """Positions of a model's feature_cols within FEATURE_COLS"""
+    return np.array([COL_TO_IDX[col] for col in feature_cols], dtype=np.intp)
+
+def _predict_one(model, X_scaled):
+    return model.predict(X_scaled)[0], model.predict_proba(X_scaled)[0][1]
+
+def predict_resistance(models, features):
+    """Run every antibiotic model on one FEATURE_COLS vector, scaling once per shared feature set"""
+    feat_vec = features.reshape(1, -1)
+    scaled = {}
+    inputs = []
+    for antibiotic, model_data in models.items():
+        key = (tuple(model_data['feature_cols']), id(model_data['scaler']))
+        if key not in scaled:
+            scaled[key] = model_data['scaler'].transform(feat_vec[:, feature_index(key[0])])
+        inputs.append((antibiotic, model_data['model'], scaled[key]))
+    outputs = Parallel(n_jobs=-1, prefer='threads')(
+        delayed(_predict_one)(model, X_scaled) for _, model, X_scaled in inputs
+    )
+    return [(antibiotic, *output) for (antibiotic, _, _), output in zip(inputs, outputs)]
+
 st.title("🧬 AMR Evolutionary Forecasting System")
 st.markdown("### Predict Current, Future, and Mechanistic Antimicrobial Resistance")
 
@@ -55,78 +147,54 @@ if models:
         if file_size_mb > 50:
             st.warning("⚠️ Large file detected. Processing may take 2-5 minutes.")
         
-        with open("temp_genome.fasta", "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        file_bytes = uploaded_file.getvalue()
         st.success(f"✅ File uploaded! ({file_size_mb:.1f} MB)")
         
+        status = st.status("📖 Reading genome...")
         try:
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            status_text.text("📖 Reading genome...")
-            progress_bar.progress(10)
-            
-            records = list(SeqIO.parse("temp_genome.fasta", "fasta"))
-            if len(records) == 0:
+            record_id, record_count, genome = load_genome(file_bytes)
+            if record_count == 0:
+                status.update(label="No sequences found", state="error")
                 st.error("No sequences found in file!")
                 st.stop()
-            elif len(records) > 1:
-                st.warning(f"⚠️ File contains {len(records)} sequences. Using the first one: {records[0].id}")
-            record = records[0]
-            seq = str(record.seq).upper()
+            elif record_count > 1:
+                st.warning(f"⚠️ File contains {record_count} sequences. Using the first one: {record_id}")
             
-            progress_bar.progress(20)
+            status.update(label="🧬 Extracting k-mer features...")
             
-            col1, col2, col3 = st.columns(3)
-            col1.metric("Accession", record.id)
-            col2.metric("Length", f"{len(seq):,} bp")
-            col3.metric("GC%", f"{(seq.count('G') + seq.count('C')) / len(seq) * 100:.1f}%")
+            summary = featurize(file_bytes)
+            features = summary['features']
             
-            status_text.text("🧬 Extracting k-mer features...")
-            progress_bar.progress(30)
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Accession", record_id)
+            col2.metric("Length", f"{summary['length']:,} bp")
+            col3.metric("GC%", f"{summary['gc_percent']:.1f}%")
+            col4.metric("N%", f"{summary['n_percent']:.2f}%")
             
-            k = 8
-            kmers = [seq[i:i+k] for i in range(len(seq) - k + 1)]
-            kmer_counts = Counter(kmers)
-            top_kmers = dict(kmer_counts.most_common(100))
-            
-            features = {}
-            for i in range(1, 101):
-                features[f'kmer_{i}'] = 0
-            for i, (kmer, count) in enumerate(top_kmers.items(), 1):
-                if i <= 100:
-                    features[f'kmer_{i}'] = count
-            features['genome_length'] = len(seq)
-            features['gc_content'] = (seq.count('G') + seq.count('C')) / len(seq) * 100
-            
-            progress_bar.progress(50)
-            status_text.text("🤖 Running ML predictions...")
+            status.update(label="🤖 Running ML predictions...")
             
             st.header("🦠 Current Resistance Profile")
-            results = []
-            for antibiotic, model_data in models.items():
-                feature_df = pd.DataFrame([features])
-                feature_df = feature_df[model_data['feature_cols']]
-                X_scaled = model_data['scaler'].transform(feature_df)
-                prediction = model_data['model'].predict(X_scaled)[0]
-                proba = model_data['model'].predict_proba(X_scaled)[0][1]
-                status = "🔴 RESISTANT" if prediction == 1 else "🟢 SUSCEPTIBLE"
-                results.append({
-                    'Antibiotic': antibiotic.replace('_', ' ').title(),
-                    'Status': status,
-                    'Confidence': f"{proba:.1%}"
-                })
-            
-            results_df = pd.DataFrame(results)
+            antibiotics, statuses, confidences = [], [], []
+            resistant_count = 0
+            onnx_session = load_onnx_models(models)
+            if onnx_session is not None:
+                predictions = predict_onnx(onnx_session, features)
+            else:
+                predictions = predict_resistance(models, features)
+            for antibiotic, prediction, proba in predictions:
+                resistant_count += prediction == 1
+                antibiotics.append(antibiotic.replace('_', ' ').title())
+                statuses.append("🔴 RESISTANT" if prediction == 1 else "🟢 SUSCEPTIBLE")
+                confidences.append(f"{proba:.1%}")
+            
+            results_df = pd.DataFrame({'Antibiotic': antibiotics, 'Status': statuses, 'Confidence': confidences})
             st.dataframe(results_df, use_container_width=True, hide_index=True)
-            resistant_count = sum(1 for r in results if '🔴' in r['Status'])
-            st.markdown(f"**Summary:** {resistant_count} of {len(results)} antibiotics show resistance")
+            st.markdown(f"**Summary:** {resistant_count} of {len(antibiotics)} antibiotics show resistance")
             
-            progress_bar.progress(70)
-            status_text.text("🔬 Scanning for resistance genes...")
+            status.update(label="🔬 Scanning for resistance genes...")
             
             st.header("🔬 Genomic Resistance Gene Analysis")
-            detected_genes = scan_genome_for_resistance_genes("temp_genome.fasta")
+            detected_genes = scan_genes(file_bytes)
             if detected_genes:
                 st.subheader("🧬 Detected Intrinsic Resistance Genes")
                 st.info("These genes are ALREADY PRESENT in the genome.")
@@ -135,42 +203,40 @@ if models:
                         st.markdown(f"**Mechanism:** {info['mechanism']}")
                         st.markdown(f"**Genes found:** {len(info['genes'])}")
                         for idx, gene in enumerate(info['genes'][:5], 1):
-                            if 'position' in gene:
-                                st.markdown(f"{idx}. Position {gene['position']:,}: `{gene['sequence']}`")
-                            else:
-                                st.markdown(f"{idx}. Marker: `{gene['marker']}` (Confidence: {gene['confidence']:.0%})")
+                            st.markdown(f"{idx}. Position {gene['position']:,}: `{gene['sequence']}`")
             else:
                 st.success("✓ No known intrinsic resistance genes detected.")
             
-            progress_bar.progress(85)
-            status_text.text("🔮 Predicting resistance evolution...")
+            status.update(label="🔮 Predicting resistance evolution...")
             
             st.header("🔮 Resistance Evolution Forecast")
+            evolution_by_class = {
+                antibiotic_class: predict_resistance_evolution(genome, antibiotic_class)
+                for antibiotic_class in ['beta_lactam', 'aminoglycoside', 'fluoroquinolone']
+            }
             col1, col2 = st.columns(2)
             
             with col1:
                 st.subheader("First-Time Exposure")
-                for antibiotic_class in ['beta_lactam', 'aminoglycoside', 'fluoroquinolone']:
-                    evolution = predict_resistance_evolution(seq, antibiotic_class)
+                for antibiotic_class, evolution in evolution_by_class.items():
                     st.markdown(f"**{antibiotic_class.replace('_', ' ').title()}**")
                     st.progress(evolution['probability'])
                     st.caption(f"Evolution probability: {evolution['probability']:.0%} in {evolution['timeline_months']} months")
             
             with col2:
                 st.subheader("Repeated Exposure")
-                for antibiotic_class in ['beta_lactam', 'aminoglycoside', 'fluoroquinolone']:
-                    evolution = predict_resistance_evolution(seq, antibiotic_class)
+                for antibiotic_class, evolution in evolution_by_class.items():
                     repeated_prob = min(evolution['probability'] * 2.5, 0.98)
                     repeated_months = max(int(evolution['timeline_months'] / 3), 1)
                     st.markdown(f"**{antibiotic_class.replace('_', ' ').title()}**")
                     st.progress(repeated_prob)
                     st.caption(f"Evolution probability: {repeated_prob:.0%} in {repeated_months} months")
             
-            progress_bar.progress(100)
-            status_text.text("✅ Analysis complete!")
+            status.update(label="✅ Analysis complete!", state="complete")
             st.success("✅ Complete analysis finished!")
             
         except Exception as e:
+            status.update(label="Analysis failed", state="error")
             st.error(f"Error: {e}")
             import traceback
             st.error(traceback.format_exc())
@@ -0,0 +1,80 @@
+import numpy as np
+from collections import Counter
+from scanner_kernels import HAVE_NUMBA, count_clean_kmers, count_packed_kmers
+
+# 2-bit codes for unambiguous bases; any other byte is marked with 4
+BASE_CODES = np.full(256, 4, dtype=np.uint8)
+BASE_CODES[list(b'ACGT')] = np.arange(4, dtype=np.uint8)
+
+def _ambiguous_window_starts(seq_array, k, chunk_size=1 << 20):
+    """Start positions of the k-mer windows that contain a non-ACGT byte, chunk_size windows at a time"""
+    n_windows = seq_array.size - k + 1
+    for chunk_start in range(0, max(n_windows, 0), chunk_size):
+        chunk_windows = min(chunk_size, n_windows - chunk_start)
+        bad = BASE_CODES[seq_array[chunk_start:chunk_start + chunk_windows + k - 1]] > 3
+        bad_so_far = np.concatenate(([0], np.cumsum(bad, dtype=np.int32)))
+        ambiguous = bad_so_far[k:] != bad_so_far[:-k]
+        for start in np.flatnonzero(ambiguous) + chunk_start:
+            yield start
+
+def count_kmers(seq_array, k=8, chunk_size=1 << 20, base_counts=None):
+    """Count every k-mer of an upper-case uint8 genome array
+
+    Returns (counts, other_counts). counts is indexed by the k-mer packed two
+    bits per base (A=0, C=1, G=2, T=3) and covers k-mers made only of A/C/G/T;
+    other_counts is a Counter, keyed by bytes, of the k-mers containing N or
+    any other symbol. Windows are encoded chunk_size at a time, so working
+    memory stays bounded on 100 MB genomes. If the genome's 256-bin
+    base_counts histogram shows only A/C/G/T, ambiguity masking is skipped.
+    With Numba installed the clean k-mers are counted by a compiled kernel,
+    over a 2-bit packed copy of the genome when it has no ambiguous bases.
+    """
+    may_be_ambiguous = base_counts is None or base_counts[list(b'ACGT')].sum() < seq_array.size
+    if HAVE_NUMBA and not may_be_ambiguous and k <= 32:
+        return count_packed_kmers(seq_array, k, BASE_CODES), Counter()
+    if HAVE_NUMBA:
+        other_counts = Counter()
+        if may_be_ambiguous:
+            other_counts.update(
+                seq_array[start:start + k].tobytes()
+                for start in _ambiguous_window_starts(seq_array, k, chunk_size)
+            )
+        return count_clean_kmers(seq_array, k, BASE_CODES), other_counts
+    counts = np.zeros(4 ** k, dtype=np.int64)
+    other_counts = Counter()
+    code_dtype = np.uint32 if k <= 16 else np.int64
+    n_windows = seq_array.size - k + 1
+    for chunk_start in range(0, max(n_windows, 0), chunk_size):
+        chunk_windows = min(chunk_size, n_windows - chunk_start)
+        digits = BASE_CODES[seq_array[chunk_start:chunk_start + chunk_windows + k - 1]]
+        codes = np.zeros(chunk_windows, dtype=code_dtype)
+        ambiguous = np.zeros(chunk_windows, dtype=bool) if may_be_ambiguous else None
+        for j in range(k):
+            window = digits[j:j + chunk_windows]
+            codes <<= 2
+            codes |= window & 3
+            if may_be_ambiguous:
+                ambiguous |= window > 3
+        if not may_be_ambiguous:
+            counts += np.bincount(codes, minlength=4 ** k)
+            continue
+        counts += np.bincount(codes[~ambiguous], minlength=4 ** k)
+        other_counts.update(
+            seq_array[start:start + k].tobytes()
+            for start in np.flatnonzero(ambiguous) + chunk_start
+        )
+    return counts, other_counts
+
+def top_kmer_counts(seq_array, k=8, n_top=100, base_counts=None):
+    """The n_top largest k-mer counts in descending order, zero-padded"""
+    counts, other_counts = count_kmers(seq_array, k, base_counts=base_counts)
+    all_counts = np.concatenate((
+        counts[counts > 0],
+        np.fromiter(other_counts.values(), dtype=np.int64, count=len(other_counts)),
+    ))
+    if all_counts.size > n_top:
+        all_counts = all_counts[np.argpartition(all_counts, -n_top)[-n_top:]]
+    largest = np.sort(all_counts)[::-1][:n_top]
+    top = np.zeros(n_top, dtype=np.int64)
+    top[:largest.size] = largest
+    return top
@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import pickle
+import hashlib
+import joblib
+import numpy as np
+from collections.abc import MutableMapping
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+MODEL_DIR = 'models'
+MODEL_SUFFIX = '.joblib'
+SOURCE_DIGEST_FILE = 'source.sha256'
+ONNX_MODEL_PATH = 'amr_models.onnx'
+
+N_TOP_KMERS = 100
+FEATURE_COLS = [f'kmer_{i}' for i in range(1, N_TOP_KMERS + 1)] + ['genome_length', 'gc_content']
+COL_TO_IDX = {col: i for i, col in enumerate(FEATURE_COLS)}
+SCALER_ARRAYS = ('mean_', 'scale_', 'var_', 'min_')
+
+def to_float32(model_data):
+    """Cast a model entry's fitted scaler arrays to float32 in place
+
+    Tree models need no change: sklearn already compares float32 inputs
+    against their thresholds, so float32 features are used as they are.
+    """
+    if isinstance(model_data, dict) and 'scaler' in model_data:
+        scaler = model_data['scaler']
+        for attr in SCALER_ARRAYS:
+            value = getattr(scaler, attr, None)
+            if isinstance(value, np.ndarray) and value.dtype != np.float32:
+                setattr(scaler, attr, value.astype(np.float32))
+    return model_data
+
+def file_digest(path):
+    """sha256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# ========================================
+# LAZY PER-ANTIBIOTIC MODEL STORE
+# ========================================
+class LazyModelDict(MutableMapping):
+    """Antibiotic name -> model_data dict, loaded from disk on first access
+
+    Each entry lives in its own uncompressed joblib file, loaded with
+    mmap_mode='r' so plain arrays such as the float32 scaler arrays written
+    by split_model_pack are mapped read-only instead of copied into memory.
+    sklearn tree estimators still copy their node arrays when unpickled.
+    """
+    def __init__(self, directory):
+        self.paths = {}
+        self.loaded = {}
+        # Digest of the pickle the directory was split from, if recorded
+        self.source_digest = None
+        digest_path = os.path.join(directory, SOURCE_DIGEST_FILE)
+        if os.path.exists(digest_path):
+            with open(digest_path) as f:
+                self.source_digest = f.read().strip()
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(MODEL_SUFFIX):
+                self.paths[name[:-len(MODEL_SUFFIX)]] = os.path.join(directory, name)
+
+    def __getitem__(self, key):
+        if key not in self.loaded:
+            self.loaded[key] = joblib.load(self.paths[key], mmap_mode='r')
+        return self.loaded[key]
+
+    def __setitem__(self, key, value):
+        self.paths.setdefault(key, None)
+        self.loaded[key] = value
+
+    def __delitem__(self, key):
+        del self.paths[key]
+        self.loaded.pop(key, None)
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def __len__(self):
+        return len(self.paths)
+
+def split_model_pack(pickle_path, directory=MODEL_DIR):
+    """Re-save a comprehensive model pickle as one joblib file per entry
+
+    Scaler arrays are cast to float32 before saving, so loading needs no
+    further conversion and can keep them memory-mapped.
+    """
+    with open(pickle_path, 'rb') as f:
+        models = pickle.load(f)
+    os.makedirs(directory, exist_ok=True)
+    for name, model_data in models.items():
+        joblib.dump(to_float32(model_data), os.path.join(directory, name + MODEL_SUFFIX), compress=False)
+    with open(os.path.join(directory, SOURCE_DIGEST_FILE), 'w') as f:
+        f.write(file_digest(pickle_path) + '\n')
+    return len(models)
+
+# ========================================
+# MERGED ONNX MODEL PACK
+# ========================================
+def _prefix_names(names, prefix):
+    renamed = [prefix + name if name else name for name in names]
+    del names[:]
+    names.extend(renamed)
+
+def export_onnx(models, path=ONNX_MODEL_PATH, source_digest=None):
+    """Convert every antibiotic's scaler and model into one multi-output ONNX graph
+
+    The graph takes the full FEATURE_COLS vector as X, gathers each model's
+    feature_cols from it, and exposes <antibiotic>__label and
+    <antibiotic>__probability outputs. The antibiotic list and source_digest
+    of the pack are kept in the model metadata for onnx_matches. Needs
+    skl2onnx and onnx.
+    """
+    import onnx
+    from onnx import helper, numpy_helper
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+    from sklearn.pipeline import Pipeline
+
+    nodes, initializers, outputs = [], [], []
+    antibiotics = []
+    opsets = {}
+    ir_version = onnx.IR_VERSION
+    for antibiotic, model_data in models.items():
+        if not (isinstance(model_data, dict) and 'model' in model_data):
+            continue
+        antibiotics.append(antibiotic)
+        prefix = antibiotic + '__'
+        # Converted graph names get their own namespace, clear of the output heads
+        inner = prefix + 'model__'
+        pipeline = Pipeline([('scaler', model_data['scaler']), ('model', model_data['model'])])
+        converted = convert_sklearn(
+            pipeline,
+            initial_types=[('X', FloatTensorType([None, len(model_data['feature_cols'])]))],
+            options={id(model_data['model']): {'zipmap': False}},
+        )
+        feature_index = np.array([COL_TO_IDX[col] for col in model_data['feature_cols']], dtype=np.int64)
+        initializers.append(numpy_helper.from_array(feature_index, prefix + 'feature_index'))
+        nodes.append(helper.make_node('Gather', ['X', prefix + 'feature_index'], [inner + 'X'], axis=1))
+        for node in converted.graph.node:
+            node.name = inner + node.name if node.name else node.name
+            _prefix_names(node.input, inner)
+            _prefix_names(node.output, inner)
+            nodes.append(node)
+        for initializer in converted.graph.initializer:
+            initializer.name = inner + initializer.name
+            initializers.append(initializer)
+        # skl2onnx classifiers output the label first, then the probabilities
+        for output, head in zip(converted.graph.output, ('label', 'probability')):
+            nodes.append(helper.make_node('Identity', [inner + output.name], [prefix + head]))
+            renamed = onnx.ValueInfoProto()
+            renamed.CopyFrom(output)
+            renamed.name = prefix + head
+            outputs.append(renamed)
+        for opset in converted.opset_import:
+            opsets[opset.domain] = max(opsets.get(opset.domain, 0), opset.version)
+        ir_version = min(ir_version, converted.ir_version)
+
+    features = helper.make_tensor_value_info('X', onnx.TensorProto.FLOAT, [None, len(FEATURE_COLS)])
+    graph = helper.make_graph(nodes, 'amr_models', [features], outputs, initializers)
+    merged = helper.make_model(graph, opset_imports=[helper.make_opsetid(domain, version) for domain, version in opsets.items()])
+    merged.ir_version = ir_version
+    helper.set_model_props(merged, {'antibiotics': json.dumps(antibiotics), 'source_sha256': source_digest or ''})
+    onnx.checker.check_model(merged)
+    onnx.save(merged, path)
+    return len(antibiotics)
+
+def load_onnx_session(path=ONNX_MODEL_PATH):
+    """An onnxruntime session for an exported model pack, or None if unavailable"""
+    if onnxruntime is None or not os.path.exists(path):
+        return None
+    return onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+
+def onnx_matches(session, models, source_digest=None):
+    """Whether an exported pack was built from these models
+
+    The antibiotics must match in order; the source digests are compared
+    too when both the pack and the caller know one.
+    """
+    metadata = session.get_modelmeta().custom_metadata_map
+    if 'antibiotics' not in metadata or json.loads(metadata['antibiotics']) != list(models):
+        return False
+    recorded = metadata.get('source_sha256')
+    return not (recorded and source_digest) or recorded == source_digest
+
+def predict_onnx(session, features):
+    """(antibiotic, prediction, probability) for every model in the pack, from one run"""
+    names = [output.name for output in session.get_outputs()]
+    values = dict(zip(names, session.run(names, {'X': features.reshape(1, -1).astype(np.float32, copy=False)})))
+    antibiotics = [name[:-len('__label')] for name in names if name.endswith('__label')]
+    return [
+        (antibiotic, values[antibiotic + '__label'][0], values[antibiotic + '__probability'][0][1])
+        for antibiotic in antibiotics
+    ]
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--onnx']
+    pickle_path = args[0] if args else 'comprehensive_amr_models.pkl'
+    print(f"Wrote {split_model_pack(pickle_path)} model files to {MODEL_DIR}/")
+    if '--onnx' in sys.argv[1:]:
+        with open(pickle_path, 'rb') as f:
+            models = pickle.load(f)
+        print(f"Wrote {export_onnx(models, source_digest=file_digest(pickle_path))} models to {ONNX_MODEL_PATH}")
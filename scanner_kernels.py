@@ -0,0 +1,248 @@
+import numpy as np
+
+try:
+    import numba
+    from numba import prange
+except ImportError:
+    numba = None
+    prange = range
+
+HAVE_NUMBA = numba is not None
+
+def _jit(parallel=False):
+    """Compile a kernel with Numba when it is installed"""
+    def decorate(func):
+        if numba is None:
+            return func
+        return numba.njit(cache=True, nogil=True, boundscheck=False, parallel=parallel)(func)
+    return decorate
+
+# ========================================
+# LITERAL AUTOMATON TABLES
+# ========================================
+def build_literal_dfa(words):
+    """Build a dense Aho-Corasick DFA over ASCII words
+
+    Returns (symbol_map, goto, out_ptr, out_ids, word_lengths). Bytes are
+    first folded through symbol_map so goto only has a column per byte that
+    occurs in some word; out_ids[out_ptr[s]:out_ptr[s + 1]] are the words
+    ending in state s.
+    """
+    encoded = [word.encode('ascii') for word in words]
+    alphabet = sorted({byte for word in encoded for byte in word})
+    symbol_map = np.zeros(256, dtype=np.int32)
+    for symbol, byte in enumerate(alphabet, 1):
+        symbol_map[byte] = symbol
+    n_symbols = len(alphabet) + 1
+
+    children = [{}]
+    outputs = [[]]
+    for word_id, word in enumerate(encoded):
+        state = 0
+        for byte in word:
+            symbol = symbol_map[byte]
+            if symbol not in children[state]:
+                children[state][symbol] = len(children)
+                children.append({})
+                outputs.append([])
+            state = children[state][symbol]
+        outputs[state].append(word_id)
+
+    goto = np.zeros((len(children), n_symbols), dtype=np.int32)
+    fail = [0] * len(children)
+    queue = [0]
+    for state in queue:
+        for symbol in range(1, n_symbols):
+            child = children[state].get(symbol)
+            fallback = goto[fail[state], symbol] if state else 0
+            if child is None:
+                goto[state, symbol] = fallback
+                continue
+            goto[state, symbol] = child
+            fail[child] = fallback
+            outputs[child] = outputs[child] + outputs[fallback]
+            queue.append(child)
+
+    out_ptr = np.zeros(len(children) + 1, dtype=np.int32)
+    out_ptr[1:] = np.cumsum([len(out) for out in outputs])
+    out_ids = np.array([word_id for out in outputs for word_id in out], dtype=np.int32)
+    word_lengths = np.array([len(word) for word in encoded], dtype=np.int64)
+    return symbol_map, goto, out_ptr, out_ids, word_lengths
+
+# ========================================
+# SCANNING KERNELS
+# ========================================
+@_jit(parallel=True)
+def _scan_dfa_chunks(seq_array, symbol_map, goto, out_ptr, out_ids, word_lengths,
+                     overlap, chunk_size, chunks, hit_ids, hit_starts, hit_counts, base_counts):
+    capacity = hit_ids.shape[1]
+    for row in prange(chunks.size):
+        chunk = chunks[row]
+        chunk_start = chunk * chunk_size
+        chunk_stop = min(chunk_start + chunk_size, seq_array.size)
+        # Warm the automaton up on the bases before the chunk, so words that
+        # straddle the boundary are reported by the chunk they end in
+        state = 0
+        for i in range(max(chunk_start - overlap, 0), chunk_start):
+            state = goto[state, symbol_map[seq_array[i]]]
+        n_hits = 0
+        for i in range(chunk_start, chunk_stop):
+            byte = seq_array[i]
+            base_counts[row, byte] += 1
+            state = goto[state, symbol_map[byte]]
+            for k in range(out_ptr[state], out_ptr[state + 1]):
+                if n_hits < capacity:
+                    hit_ids[row, n_hits] = out_ids[k]
+                    hit_starts[row, n_hits] = i - word_lengths[out_ids[k]] + 1
+                n_hits += 1
+        hit_counts[row] = n_hits
+
+def scan_literals_and_bases(seq_array, dfa, chunk_size=1 << 20, capacity=None):
+    """Find the DFA's words in a uint8 array and count its bytes in one pass
+
+    The array is split into chunks scanned in parallel. Returns (hit_ids,
+    hit_starts, base_counts), with hits ordered by end position and
+    base_counts a 256-bin byte histogram of the sequence. Each chunk keeps
+    up to capacity hits (by default one per 256 bases); only the chunks
+    that overflow it are scanned again, with room for all their hits.
+    """
+    word_lengths = dfa[4]
+    overlap = int(word_lengths.max()) - 1 if word_lengths.size else 0
+    n_chunks = max(1, -(-seq_array.size // chunk_size))
+    if capacity is None:
+        capacity = max(chunk_size // 256, 1)
+
+    def scan(chunks, capacity):
+        hit_ids = np.empty((chunks.size, capacity), dtype=np.int32)
+        hit_starts = np.empty((chunks.size, capacity), dtype=np.int64)
+        hit_counts = np.zeros(chunks.size, dtype=np.int64)
+        base_counts = np.zeros((chunks.size, 256), dtype=np.int64)
+        _scan_dfa_chunks(seq_array, *dfa, overlap, chunk_size, chunks,
+                         hit_ids, hit_starts, hit_counts, base_counts)
+        return hit_ids, hit_starts, hit_counts, base_counts
+
+    hit_ids, hit_starts, hit_counts, base_counts = scan(np.arange(n_chunks), capacity)
+    chunk_ids = [hit_ids[chunk, :min(hit_counts[chunk], capacity)] for chunk in range(n_chunks)]
+    chunk_starts = [hit_starts[chunk, :min(hit_counts[chunk], capacity)] for chunk in range(n_chunks)]
+    overflowed = np.flatnonzero(hit_counts > capacity)
+    if overflowed.size:
+        # The byte counts of the first pass are complete; only hits were dropped
+        more_ids, more_starts, more_counts, _ = scan(overflowed, int(hit_counts[overflowed].max()))
+        for row, chunk in enumerate(overflowed):
+            chunk_ids[chunk] = more_ids[row, :more_counts[row]]
+            chunk_starts[chunk] = more_starts[row, :more_counts[row]]
+    return np.concatenate(chunk_ids), np.concatenate(chunk_starts), base_counts.sum(axis=0)
+
+@_jit(parallel=True)
+def _count_kmer_chunks(seq_array, base_codes, k, chunk_size, counts):
+    n_windows = seq_array.size - k + 1
+    mask = (1 << (2 * k)) - 1
+    for chunk in prange(counts.shape[0]):
+        chunk_start = chunk * chunk_size
+        chunk_stop = min(chunk_start + chunk_size, n_windows) + k - 1
+        code = 0
+        valid = 0
+        for i in range(chunk_start, chunk_stop):
+            digit = base_codes[seq_array[i]]
+            if digit > 3:
+                valid = 0
+                continue
+            code = ((code << 2) | digit) & mask
+            valid += 1
+            if valid >= k:
+                counts[chunk, code] += 1
+
+@_jit(parallel=True)
+def _count_kmer8_chunks(seq_array, base_codes, chunk_size, counts):
+    # _count_kmer_chunks with k fixed at 8, so the rolling code fits a
+    # uint32 register and the mask and window length are constants
+    n_windows = seq_array.size - 7
+    for chunk in prange(counts.shape[0]):
+        chunk_start = chunk * chunk_size
+        chunk_stop = min(chunk_start + chunk_size, n_windows) + 7
+        code = np.uint32(0)
+        valid = 0
+        for i in range(chunk_start, chunk_stop):
+            digit = base_codes[seq_array[i]]
+            if digit > 3:
+                valid = 0
+                continue
+            code = ((code << np.uint32(2)) | np.uint32(digit)) & np.uint32(0xFFFF)
+            valid += 1
+            if valid >= 8:
+                counts[chunk, code] += 1
+
+@_jit(parallel=True)
+def _pack_2bit(seq_array, base_codes, packed):
+    n_full = seq_array.size // 32
+    for w in prange(n_full):
+        word = np.uint64(0)
+        for j in range(w * 32, w * 32 + 32):
+            word = (word << np.uint64(2)) | np.uint64(base_codes[seq_array[j]] & 3)
+        packed[w] = word
+    # The partial last word and the padding word after it
+    for w in range(n_full, packed.size):
+        word = np.uint64(0)
+        for j in range(w * 32, w * 32 + 32):
+            digit = base_codes[seq_array[j]] & 3 if j < seq_array.size else 0
+            word = (word << np.uint64(2)) | np.uint64(digit)
+        packed[w] = word
+
+@_jit(parallel=True)
+def _count_packed_kmer_chunks(packed, n_windows, k, chunk_words, counts):
+    drop = np.uint64(64 - 2 * k)
+    for chunk in prange(counts.shape[0]):
+        word_start = chunk * chunk_words
+        # Stop at the last word holding a window start; the words after it
+        # (the tail padding) must not be counted from offset 0
+        word_stop = min(word_start + chunk_words, -(-n_windows // 32))
+        for w in range(word_start, word_stop):
+            hi = packed[w]
+            lo = packed[w + 1]
+            counts[chunk, hi >> drop] += 1
+            # Each loaded word pair yields the k-mers starting at all 32 offsets
+            for offset in range(1, min(32, n_windows - w * 32)):
+                shift = np.uint64(2 * offset)
+                word = (hi << shift) | (lo >> (np.uint64(64) - shift))
+                counts[chunk, word >> drop] += 1
+
+def _split_for_threads(n_items, min_chunk):
+    """(n_chunks, chunk_size) giving at most one chunk per Numba thread"""
+    n_chunks = max(1, min(numba.get_num_threads(), n_items // min_chunk))
+    return n_chunks, -(-n_items // n_chunks)
+
+def count_clean_kmers(seq_array, k, base_codes, min_chunk=1 << 20):
+    """Count the k-mers of a uint8 array whose bases all have a 2-bit code
+
+    base_codes maps each byte to 0-3, or to a larger value for ambiguous
+    bases; windows containing one are skipped. The windows are split into
+    at most one chunk per Numba thread, each counted into its own row. The
+    app's k=8 goes through a kernel specialised for it.
+    """
+    n_windows = seq_array.size - k + 1
+    if n_windows <= 0:
+        return np.zeros(4 ** k, dtype=np.int64)
+    n_chunks, chunk_size = _split_for_threads(n_windows, min_chunk)
+    counts = np.zeros((n_chunks, 4 ** k), dtype=np.int64)
+    if k == 8:
+        _count_kmer8_chunks(seq_array, base_codes, chunk_size, counts)
+    else:
+        _count_kmer_chunks(seq_array, base_codes, k, chunk_size, counts)
+    return counts.sum(axis=0)
+
+def count_packed_kmers(seq_array, k, base_codes, min_chunk=1 << 20):
+    """Count the k-mers of a uint8 array made only of 2-bit coded bases
+
+    The bases are first packed 32 to a uint64, first base in the high bits,
+    so each k-mer code (k <= 32) is read off a pair of neighbouring words
+    with two shifts; this quarters the memory traffic of the counting pass.
+    """
+    n_windows = seq_array.size - k + 1
+    if n_windows <= 0:
+        return np.zeros(4 ** k, dtype=np.int64)
+    packed = np.empty(-(-seq_array.size // 32) + 1, dtype=np.uint64)
+    _pack_2bit(seq_array, base_codes, packed)
+    n_chunks, chunk_words = _split_for_threads(-(-n_windows // 32), min_chunk // 32 or 1)
+    counts = np.zeros((n_chunks, 4 ** k), dtype=np.int64)
+    _count_packed_kmer_chunks(packed, n_windows, k, chunk_words, counts)
+    return counts.sum(axis=0)